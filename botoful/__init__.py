@@ -1,3 +1,5 @@
 from .query import Query
 from .filters import ValueOf
-from .table import Table
\ No newline at end of file
+from .table import Table
+from .codecs import Codec, ZlibCodec, LzmaCodec
+from .streams import StreamConsumer, StreamRecord, CheckpointStore, MemoryCheckpointStore, TableCheckpointStore
\ No newline at end of file
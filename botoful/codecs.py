@@ -0,0 +1,270 @@
+from __future__ import annotations
+
+import json
+import lzma
+import random
+import time
+import uuid
+import zlib
+from typing import Dict, List, Tuple
+
+from botoful.serializers import serialize, deserializer
+
+# Attribute on a parent item that lists the keys of the chunk items holding each chunked attribute
+CHUNKS_ATTRIBUTE = '__chunks__'
+
+# Placeholder used to add CHUNKS_ATTRIBUTE to a ProjectionExpression
+CHUNKS_PLACEHOLDER = '#botoful_chunks'
+
+# Attribute on a chunk item that holds its slice of the encoded value
+CHUNK_DATA_ATTRIBUTE = '__chunk__'
+
+# DynamoDB rejects items larger than 400KB, counting attribute names and values
+MAX_ITEM_SIZE = 400 * 1024
+
+# Size of each slice of a chunked value, leaving headroom in the chunk item for its key
+DEFAULT_CHUNK_SIZE = 350 * 1024
+
+BATCH_GET_LIMIT = 100
+BATCH_WRITE_LIMIT = 25
+
+# Unprocessed keys and items are retried with jittered exponential backoff up to this many times
+MAX_BATCH_ATTEMPTS = 8
+BATCH_BACKOFF = 0.05
+
+
+class MissingChunkError(RuntimeError):
+    pass
+
+
+class Codec:
+    # Compresses an attribute value into a binary attribute.
+    # Values are encoded in DynamoDB's typed JSON form, so numbers, sets and nested types round-trip exactly,
+    # and anything the serializer cannot store (floats, binary inside documents) is rejected with a TypeError.
+    # When chunked is set, the value may be split across separate chunk items if the item would exceed the size limit
+
+    def __init__(self, chunked: bool = False, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        self.chunked = chunked
+        self.chunk_size = chunk_size
+
+    def compress(self, data: bytes) -> bytes:
+        raise NotImplementedError
+
+    def decompress(self, data: bytes) -> bytes:
+        raise NotImplementedError
+
+    def encode(self, value) -> bytes:
+        return self.compress(json.dumps(serialize(value), separators=(',', ':')).encode('utf-8'))
+
+    def decode(self, data: bytes):
+        return deserializer.deserialize(json.loads(self.decompress(data).decode('utf-8')))
+
+
+class ZlibCodec(Codec):
+
+    def __init__(self, level: int = zlib.Z_DEFAULT_COMPRESSION, **kwargs):
+        super().__init__(**kwargs)
+        self.level = level
+
+    def compress(self, data: bytes) -> bytes:
+        return zlib.compress(data, self.level)
+
+    def decompress(self, data: bytes) -> bytes:
+        return zlib.decompress(data)
+
+
+class LzmaCodec(Codec):
+
+    def __init__(self, preset: int = 6, **kwargs):
+        super().__init__(**kwargs)
+        self.preset = preset
+
+    def compress(self, data: bytes) -> bytes:
+        return lzma.compress(data, preset=self.preset)
+
+    def decompress(self, data: bytes) -> bytes:
+        return lzma.decompress(data)
+
+
+def _value_size(value: Dict) -> int:
+    # A conservative estimate of the stored size of a serialized attribute value
+    (kind, data), = value.items()
+
+    if kind in ('S', 'N'):
+        return len(data.encode('utf-8'))
+    if kind == 'B':
+        return len(data)
+    if kind in ('SS', 'NS'):
+        return sum(len(v.encode('utf-8')) for v in data)
+    if kind == 'BS':
+        return sum(len(v) for v in data)
+    if kind == 'L':
+        return 3 + sum(1 + _value_size(v) for v in data)
+    if kind == 'M':
+        return 3 + sum(1 + len(k.encode('utf-8')) + _value_size(v) for k, v in data.items())
+
+    return 1
+
+
+def item_size(item: Dict) -> int:
+    return sum(len(name.encode('utf-8')) + _value_size(value) for name, value in item.items())
+
+
+def _chunk_key(key: Dict, attribute: str, version: str, index: int) -> Dict:
+    # Chunk items suffix every key value, which moves them out of the parent's partition where queries cannot see them.
+    # The version is unique to each write, so a put never overwrites chunks that an existing parent refers to
+    for name, value in key.items():
+        if 'S' not in value:
+            raise ValueError(f"Attribute '{attribute}' can only be chunked on items whose key attributes are strings")
+
+    return {name: {'S': f"{value['S']}#{attribute}#{version}#{index}"} for name, value in key.items()}
+
+
+def encode_item(key: Dict, data: Dict, codecs: Dict[str, Codec],
+                max_item_size: int = MAX_ITEM_SIZE) -> Tuple[Dict, List[Dict]]:
+    # Serializes data for a put, returning the item and any chunk items that must be written alongside it.
+    # While the item is over max_item_size, the largest chunkable attribute is moved into chunk items
+    item = {}
+    for attribute, value in data.items():
+        codec = codecs.get(attribute)
+        item[attribute] = serialize(value) if codec is None else {'B': codec.encode(value)}
+
+    item.update(key)
+
+    chunkable = sorted(
+        (attribute for attribute, codec in codecs.items() if codec.chunked and attribute in data),
+        key=lambda attribute: len(item[attribute]['B']),
+        reverse=True
+    )
+
+    chunk_items = []
+    chunk_refs = {}
+    version = uuid.uuid4().hex
+
+    for attribute in chunkable:
+        if item_size(item) <= max_item_size:
+            break
+
+        encoded = item.pop(attribute)['B']
+        chunk_size = codecs[attribute].chunk_size
+
+        refs = []
+        for index, offset in enumerate(range(0, len(encoded), chunk_size)):
+            chunk_key = _chunk_key(key, attribute, version, index)
+            chunk_items.append({**chunk_key, CHUNK_DATA_ATTRIBUTE: {'B': encoded[offset:offset + chunk_size]}})
+            refs.append({'M': chunk_key})
+
+        chunk_refs[attribute] = {'L': refs}
+        item[CHUNKS_ATTRIBUTE] = {'M': chunk_refs}
+
+    return item, chunk_items
+
+
+def projects_chunks(attributes, codecs: Dict[str, Codec]) -> bool:
+    # Whether a projection names a chunked attribute, in which case CHUNKS_ATTRIBUTE must be fetched with it
+    return any(codecs[attribute].chunked for attribute in attributes if attribute in codecs)
+
+
+def _chunk_refs(item: Dict, attributes=None) -> Dict[str, List[Dict]]:
+    if CHUNKS_ATTRIBUTE not in item:
+        return {}
+
+    return {
+        attribute: [ref['M'] for ref in refs['L']]
+        for attribute, refs in item[CHUNKS_ATTRIBUTE]['M'].items()
+        if not attributes or attribute in attributes
+    }
+
+
+def chunk_keys(item: Dict, attributes=None) -> List[Dict]:
+    # The keys of the chunk items referenced by a raw (serialized) item, optionally only for the given attributes
+    return [key for keys in _chunk_refs(item, attributes).values() for key in keys]
+
+
+def _backoff(attempt: int):
+    time.sleep(BATCH_BACKOFF * 2 ** attempt * random.uniform(0.5, 1.5))
+
+
+def _batch_write(client, table_name: str, requests: List[Dict]):
+    for offset in range(0, len(requests), BATCH_WRITE_LIMIT):
+        request = {table_name: requests[offset:offset + BATCH_WRITE_LIMIT]}
+
+        for attempt in range(MAX_BATCH_ATTEMPTS):
+            if attempt:
+                _backoff(attempt)
+
+            request = client.batch_write_item(RequestItems=request).get('UnprocessedItems')
+            if not request:
+                break
+        else:
+            raise RuntimeError(f"Could not write all chunks after {MAX_BATCH_ATTEMPTS} attempts")
+
+
+def write_chunks(client, table_name: str, chunk_items: List[Dict]):
+    _batch_write(client, table_name, [{'PutRequest': {'Item': item}} for item in chunk_items])
+
+
+def delete_chunks(client, table_name: str, keys: List[Dict]):
+    _batch_write(client, table_name, [{'DeleteRequest': {'Key': key}} for key in keys])
+
+
+def _fetch(client, table_name: str, keys: List[Dict], consistent: bool) -> List[Dict]:
+    fetched = []
+
+    for offset in range(0, len(keys), BATCH_GET_LIMIT):
+        request = {table_name: {'Keys': keys[offset:offset + BATCH_GET_LIMIT], 'ConsistentRead': consistent}}
+
+        for attempt in range(MAX_BATCH_ATTEMPTS):
+            if attempt:
+                _backoff(attempt)
+
+            response = client.batch_get_item(RequestItems=request)
+            fetched.extend(response['Responses'].get(table_name, []))
+
+            request = response.get('UnprocessedKeys')
+            if not request:
+                break
+        else:
+            raise RuntimeError(f"Could not read all chunks after {MAX_BATCH_ATTEMPTS} attempts")
+
+    return fetched
+
+
+def resolve_chunks(client, table_name: str, items: List[Dict], consistent: bool = False,
+                   attributes=None) -> List[Dict]:
+    # Takes raw (serialized) items and joins chunked attributes back onto them, only joining the given
+    # attributes when the items were read with a projection. All chunks needed are fetched with batched reads
+    keys = [key for item in items for key in chunk_keys(item, attributes)]
+    if not keys:
+        return items
+
+    key_names = list(keys[0].keys())
+
+    def identity(key):
+        return tuple(key[name]['S'] for name in key_names)
+
+    chunks = {
+        identity(chunk): chunk[CHUNK_DATA_ATTRIBUTE]['B'] for chunk in _fetch(client, table_name, keys, consistent)
+    }
+
+    resolved = []
+    for item in items:
+        if CHUNKS_ATTRIBUTE not in item:
+            resolved.append(item)
+            continue
+
+        refs = _chunk_refs(item, attributes)
+        item = dict(item)
+        del item[CHUNKS_ATTRIBUTE]
+
+        for attribute, keys in refs.items():
+            try:
+                data = b''.join(bytes(chunks[identity(key)]) for key in keys)
+            except KeyError:
+                raise MissingChunkError(f"Missing chunk for attribute '{attribute}'") from None
+
+            item[attribute] = {'B': data}
+
+        resolved.append(item)
+
+    return resolved
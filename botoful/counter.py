@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+import atexit
+import random
+import threading
+import time
+from decimal import Decimal
+from typing import Dict, List, Optional, Tuple, TYPE_CHECKING
+
+from botocore.exceptions import ClientError
+
+from botoful.serializers import serialize
+
+if TYPE_CHECKING:
+    from botoful.table import Table, Item
+
+# The flush on close is retried with jittered exponential backoff before the remaining increments are given up
+CLOSE_FLUSH_ATTEMPTS = 5
+CLOSE_FLUSH_BACKOFF = 0.1
+
+
+class Counter:
+    # Coalesces atomic counter increments in memory and writes them as merged ADD updates.
+    # Pending increments are flushed by a background thread every flush_interval seconds, as soon as
+    # max_pending keys are waiting, when flush() or close() is called and when the interpreter exits
+
+    def __init__(self, table: Table, flush_interval: float = 1.0, max_pending: int = 1000, client=None):
+        self.table = table
+        self.client = client if client is not None else table.client
+
+        if self.client is None:
+            raise RuntimeError("You need to provide a boto3 dynamodb client")
+
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+
+        self.increments = 0
+        self.writes = 0
+        self.last_flush_latency: Optional[float] = None
+        self.last_error: Optional[Exception] = None
+
+        # Increments rejected by DynamoDB as invalid (for example an ADD on a non-numeric attribute), and increments
+        # that could still not be written when the counter was closed, as (key, attributes, error) tuples
+        self.dropped: List[Tuple[Dict, Dict[str, int], Exception]] = []
+
+        self._pending: Dict[Tuple, Tuple[str, Dict, Dict[str, int]]] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._closed = False
+
+        self._thread = threading.Thread(target=self._run, name='botoful-counter', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def __enter__(self) -> Counter:
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @property
+    def coalescing_ratio(self) -> Optional[float]:
+        # Number of increments recorded per update call issued
+        return self.increments / self.writes if self.writes else None
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def increment(self, item: Item, attribute: str, amount=1) -> None:
+        if isinstance(amount, bool) or not isinstance(amount, (int, Decimal)):
+            raise TypeError(f"Counter amounts must be int or Decimal, not {type(amount).__name__}")
+
+        request = item.build()
+        table_name, key = request['TableName'], request['Key']
+        identity = (table_name, *((name, *value.items()) for name, value in sorted(key.items())))
+
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Cannot increment a closed counter")
+
+            _, _, attributes = self._pending.setdefault(identity, (table_name, key, {}))
+            attributes[attribute] = attributes.get(attribute, 0) + amount
+            self.increments += 1
+
+            if len(self._pending) >= self.max_pending:
+                self._wakeup.set()
+
+    def flush(self) -> None:
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+
+            if not pending:
+                return
+
+            start = time.monotonic()
+            errors = []
+
+            for identity, (table_name, key, attributes) in pending.items():
+                try:
+                    self._write(table_name, key, attributes)
+                except ClientError as e:
+                    self.last_error = e
+
+                    if e.response['Error']['Code'] == 'ValidationException':
+                        self.dropped.append((key, attributes, e))
+                    else:
+                        self._requeue(identity, table_name, key, attributes)
+                        errors.append(e)
+                except Exception as e:
+                    self.last_error = e
+                    self._requeue(identity, table_name, key, attributes)
+                    errors.append(e)
+
+            self.last_flush_latency = time.monotonic() - start
+
+            # Every key has been attempted, failed increments are kept for the next flush
+            if errors:
+                raise errors[0]
+
+    def close(self) -> None:
+        with self._lock:
+            if self._closed:
+                return
+
+            self._closed = True
+
+        atexit.unregister(self.close)
+
+        self._wakeup.set()
+        self._thread.join()
+
+        for attempt in range(CLOSE_FLUSH_ATTEMPTS):
+            if attempt:
+                time.sleep(CLOSE_FLUSH_BACKOFF * 2 ** (attempt - 1) * random.uniform(0.5, 1.5))
+
+            try:
+                self.flush()
+                return
+            except Exception as e:
+                error = e
+
+        # Nothing will flush a closed counter again, so the remaining increments are reported as dropped
+        with self._lock:
+            pending, self._pending = self._pending, {}
+
+        self.dropped.extend((key, attributes, error) for _, key, attributes in pending.values())
+        raise error
+
+    def _write(self, table_name: str, key: Dict, attributes: Dict[str, int]):
+        names = {f"#a{i}": attribute for i, attribute in enumerate(attributes)}
+        values = {f":v{i}": serialize(amount) for i, amount in enumerate(attributes.values())}
+
+        self.client.update_item(
+            TableName=table_name,
+            Key=key,
+            UpdateExpression="ADD " + ", ".join(f"#a{i} :v{i}" for i in range(len(attributes))),
+            ExpressionAttributeNames=names,
+            ExpressionAttributeValues=values,
+        )
+        self.writes += 1
+
+    def _requeue(self, identity: Tuple, table_name: str, key: Dict, attributes: Dict[str, int]):
+        # Returns unwritten increments so they are retried on the next flush
+        with self._lock:
+            _, _, pending = self._pending.setdefault(identity, (table_name, key, {}))
+            for attribute, amount in attributes.items():
+                pending[attribute] = pending.get(attribute, 0) + amount
+
+    def _run(self):
+        while not self._closed:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+
+            if self._closed:
+                break
+
+            try:
+                self.flush()
+            except Exception:
+                # The error is kept on last_error and the increments are retried on the next interval
+                pass
@@ -2,14 +2,56 @@ from __future__ import annotations
 
 import copy
 import numbers
+from collections.abc import Sequence
 from functools import wraps, reduce
-from typing import List, Set, Union
+from typing import List, Set, Union, Optional, Dict
 
+from botocore.paginate import TokenDecoder
+
+from .codecs import CHUNKS_ATTRIBUTE, CHUNKS_PLACEHOLDER, MissingChunkError, projects_chunks, resolve_chunks
 from .filters import build_filter, Filter, ConditionBase
 from .reserved import RESERVED_KEYWORDS
 from .serializers import deserialize, serialize
 
 
+def _merge_capacity(total, capacity):
+    # Sums the numeric fields of two ConsumedCapacity structures, recursing into the per index breakdowns
+    if total is None:
+        return capacity
+
+    merged = dict(total)
+    for key, value in capacity.items():
+        if isinstance(value, dict):
+            merged[key] = _merge_capacity(total.get(key), value)
+        elif isinstance(value, numbers.Number):
+            merged[key] = total.get(key, 0) + value
+        else:
+            merged[key] = value
+
+    return merged
+
+
+def _last_evaluated_key(next_token, items) -> Optional[Dict]:
+    # The key of the last item returned, taken from botocore's resume token. When botocore truncated the last page,
+    # the token holds the key the truncated page started from, so the key is read from the last item kept instead
+    if next_token is None:
+        return None
+
+    token = TokenDecoder().decode(next_token)
+    exclusive_start_key = token.get('ExclusiveStartKey')
+
+    if not exclusive_start_key:
+        return None
+
+    if 'boto_truncate_amount' not in token:
+        return deserialize(exclusive_start_key)
+
+    if not items or not all(name in items[-1] for name in exclusive_start_key):
+        return None
+
+    return deserialize({name: items[-1][name] for name in exclusive_start_key})
+
+
 def fluent(func):
     # Decorator that assists in a fluent api.
     # It clones the current 'self', calls the wrapped method on the clone and returns the clone
@@ -21,17 +63,81 @@ def fluent(func):
     return fluent_wrapper
 
 
-class QueryResult:
+class QueryResult(Sequence):
+    # A compact, read-only sequence over the items returned by a query.
+    # Model instances are built each time an item is accessed. With cache_models, the first instance built for an
+    # item replaces its dict, so that only one representation of each item is ever held
+    __slots__ = (
+        '_items', '_cached', '_model', '_list', 'next_token', 'last_evaluated_key', 'scanned_count', 'consumed_capacity'
+    )
 
-    def __init__(self, items=None, next_token=None, model=None):
+    def __init__(self, items=None, next_token=None, model=None, scanned_count=None, consumed_capacity=None,
+                 cache_models=False, last_evaluated_key=None):
         if items is None:
             items = []
 
-        self.items = [model(**item) for item in items] if model else items
-        self.count = len(items)
+        self._items = items
+        self._model = model
+        self._cached = bytearray(len(items)) if model and cache_models else None
+        self._list = None
+
         self.next_token = next_token
+        self.last_evaluated_key = last_evaluated_key
+        self.scanned_count = scanned_count
+        self.consumed_capacity = consumed_capacity
 
-        self._model = model
+    @property
+    def count(self):
+        return len(self._items)
+
+    @property
+    def items(self) -> list:
+        # With a model, the list of every instance is built on first access and then kept, which holds a second
+        # reference to each item. Iterate or index the result directly to avoid it
+        if not self._model:
+            return self._items
+
+        if self._list is None:
+            self._list = list(self)
+
+        return self._list
+
+    def _materialize(self, index):
+        if self._cached is None:
+            return self._model(**self._items[index])
+
+        if not self._cached[index]:
+            self._items[index] = self._model(**self._items[index])
+            self._cached[index] = 1
+
+        return self._items[index]
+
+    def __len__(self):
+        return len(self._items)
+
+    def __getitem__(self, index):
+        if not self._model:
+            return self._items[index]
+
+        if isinstance(index, slice):
+            return [self._materialize(i) for i in range(*index.indices(len(self._items)))]
+
+        if index < 0:
+            index += len(self._items)
+
+        if not 0 <= index < len(self._items):
+            raise IndexError("QueryResult index out of range")
+
+        return self._materialize(index)
+
+    def __iter__(self):
+        if not self._model:
+            return iter(self._items)
+
+        return (self._materialize(i) for i in range(len(self._items)))
+
+    def __repr__(self):
+        return f"QueryResult(count={self.count}, next_token={self.next_token!r})"
 
 
 class Condition:
@@ -85,9 +191,10 @@ class Condition:
 
 class Query:
 
-    def __init__(self, table=None):
+    def __init__(self, table=None, codecs=None):
 
         self.table = table
+        self._codecs = codecs
 
         self._max_items = None
         self._index = None
@@ -99,6 +206,7 @@ class Query:
         self._page_size = None
         self._consistent_read = False
         self._scan_index_forward = True
+        self._return_consumed_capacity = None
 
     @fluent
     def page_size(self, page_size) -> Query:
@@ -153,6 +261,11 @@ class Query:
         self._scan_index_forward = False
         return self
 
+    @fluent
+    def return_consumed_capacity(self, level: str = 'TOTAL') -> Query:
+        self._return_consumed_capacity = level
+        return self
+
     def _name_variable(self, variable):
         if variable.upper() not in RESERVED_KEYWORDS:
             return variable
@@ -209,6 +322,11 @@ class Query:
             if reserved_keywords_attributes:
                 expression_attribute_names.update({f"#{attr}": attr for attr in reserved_keywords_attributes})
 
+            # Chunked attributes are only stored as references to their chunks
+            if self._codecs and projects_chunks(self._attributes_to_fetch, self._codecs):
+                result['ProjectionExpression'] += f", {CHUNKS_PLACEHOLDER}"
+                expression_attribute_names[CHUNKS_PLACEHOLDER] = CHUNKS_ATTRIBUTE
+
         if self._filter:
             filter_to_apply = build_filter(self._filter)
             expression_attribute_names.update(filter_to_apply.name_placeholders)
@@ -222,6 +340,9 @@ class Query:
         if not self._scan_index_forward:
             result['ScanIndexForward'] = self._scan_index_forward
 
+        if self._return_consumed_capacity:
+            result['ReturnConsumedCapacity'] = self._return_consumed_capacity
+
         if expression_attribute_names:
             result['ExpressionAttributeNames'] = expression_attribute_names
 
@@ -237,7 +358,7 @@ class Query:
         import json
         print(json.dumps(self.build(params=params, starting_token=starting_token), indent=2))
 
-    def execute(self, client, starting_token=None, model=None, params=None) -> QueryResult:
+    def execute(self, client, starting_token=None, model=None, params=None, cache_models=False) -> QueryResult:
 
         if params is None:
             params = {}
@@ -248,12 +369,51 @@ class Query:
         paginator = client.get_paginator('query')
         query = self.build(params=params, starting_token=starting_token)
 
-        response = paginator.paginate(**query).build_full_result()
-
-        items = [deserialize(item) for item in response.get('Items')]
-        next_token = response.get('NextToken')
-
-        return QueryResult(items=items, next_token=next_token, model=model)
+        items, next_token, scanned_count, consumed_capacity = self._fetch_pages(paginator, query)
+        last_evaluated_key = _last_evaluated_key(next_token, items)
+
+        if self._codecs:
+            try:
+                items = self._resolve_chunks(client, items)
+            except MissingChunkError:
+                # An item was replaced while it was being read, the replacement's chunks are already written
+                items, next_token, scanned_count, consumed_capacity = self._fetch_pages(paginator, query)
+                last_evaluated_key = _last_evaluated_key(next_token, items)
+                items = self._resolve_chunks(client, items)
+
+        return QueryResult(
+            items=[deserialize(item, codecs=self._codecs) for item in items],
+            next_token=next_token,
+            model=model,
+            scanned_count=scanned_count,
+            consumed_capacity=consumed_capacity,
+            cache_models=cache_models,
+            last_evaluated_key=last_evaluated_key
+        )
+
+    def _fetch_pages(self, paginator, query):
+        # Pages are walked directly rather than through build_full_result, which only keeps
+        # the ConsumedCapacity of the first page
+        pages = paginator.paginate(**query)
+        items = []
+        scanned_count = None
+        consumed_capacity = None
+
+        for page in pages:
+            items.extend(page['Items'])
+
+            if 'ScannedCount' in page:
+                scanned_count = (scanned_count or 0) + page['ScannedCount']
+
+            if 'ConsumedCapacity' in page:
+                consumed_capacity = _merge_capacity(consumed_capacity, page['ConsumedCapacity'])
+
+        return items, pages.resume_token, scanned_count, consumed_capacity
+
+    def _resolve_chunks(self, client, items):
+        return resolve_chunks(
+            client, self.table, items, consistent=self._consistent_read, attributes=self._attributes_to_fetch
+        )
 
     def execute_paginated(self, starting_token=None, *args, **kwargs) -> QueryResult:
         while True:
@@ -4,8 +4,15 @@ from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
 deserializer = TypeDeserializer()
 serializer = TypeSerializer()
 
-def deserialize(document):
-    return deserializer.deserialize({'M': document})
+def deserialize(document, codecs=None):
+    if not codecs:
+        return deserializer.deserialize({'M': document})
+
+    # Attributes with a registered codec are decoded straight from their binary value
+    return {
+        k: codecs[k].decode(v['B']) if k in codecs and 'B' in v else deserializer.deserialize(v)
+        for k, v in document.items()
+    }
 
 def serialize(value):
     return serializer.serialize(value)
\ No newline at end of file
@@ -0,0 +1,244 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, TYPE_CHECKING
+
+from botocore.exceptions import ClientError
+
+from botoful.serializers import deserialize
+
+if TYPE_CHECKING:
+    from botoful.table import Table
+
+# Checkpoint value recorded once a closed shard has been fully consumed
+SHARD_END = 'SHARD_END'
+
+StreamRecord = namedtuple('StreamRecord', [
+    'shard_id', 'sequence_number', 'event_name', 'keys', 'new_image', 'old_image', 'approximate_creation_time'
+])
+
+
+class CheckpointStore:
+    # Persists the last processed sequence number of each shard so that a consumer can resume where it left off
+
+    def get(self, shard_id: str) -> Optional[str]:
+        raise NotImplementedError
+
+    def put(self, shard_id: str, sequence_number: str) -> None:
+        raise NotImplementedError
+
+
+class MemoryCheckpointStore(CheckpointStore):
+
+    def __init__(self):
+        self.checkpoints: Dict[str, str] = {}
+
+    def get(self, shard_id: str) -> Optional[str]:
+        return self.checkpoints.get(shard_id)
+
+    def put(self, shard_id: str, sequence_number: str) -> None:
+        self.checkpoints[shard_id] = sequence_number
+
+
+class TableCheckpointStore(CheckpointStore):
+    # Stores checkpoints as items keyed by consumer name and shard id in a botoful Table
+
+    def __init__(self, table: Table, consumer: str, partition_key: str = 'PK', sort_key: str = 'SK'):
+        self.table = table
+        self.consumer = consumer
+        self.partition_key = partition_key
+        self.sort_key = sort_key
+
+    def _item(self, shard_id: str):
+        return self.table.item(**{self.partition_key: self.consumer, self.sort_key: shard_id})
+
+    def get(self, shard_id: str) -> Optional[str]:
+        item = self._item(shard_id).consistent().attributes(['sequence_number']).get()
+        return item['sequence_number'] if item else None
+
+    def put(self, shard_id: str, sequence_number: str) -> None:
+        self._item(shard_id).put({'sequence_number': sequence_number})
+
+
+def _to_record(shard_id: str, record: Dict) -> StreamRecord:
+    data = record['dynamodb']
+
+    return StreamRecord(
+        shard_id=shard_id,
+        sequence_number=data['SequenceNumber'],
+        event_name=record['eventName'],
+        keys=deserialize(data['Keys']),
+        new_image=deserialize(data['NewImage']) if data.get('NewImage') else None,
+        old_image=deserialize(data['OldImage']) if data.get('OldImage') else None,
+        approximate_creation_time=data.get('ApproximateCreationDateTime'),
+    )
+
+
+class StreamConsumer:
+    # Consumes a DynamoDB stream, polling shards concurrently on a worker pool.
+    # A child shard is only read once its parent has been consumed to the end, and the records of a shard are
+    # handed to the handler in sequence order, so that all records for a given key are delivered in order.
+    # The handler is called with a list of StreamRecords and may be called concurrently for different shards.
+    # The checkpoint for a shard is only advanced after the handler returns
+
+    def __init__(self, client, stream_arn: str, handler: Callable[[List[StreamRecord]], None],
+                 checkpoints: Optional[CheckpointStore] = None, max_workers: int = 4, batch_size: int = 1000,
+                 iterator_type: str = 'TRIM_HORIZON', discovery_interval: float = 60.0):
+        self.client = client
+        self.stream_arn = stream_arn
+        self.handler = handler
+        self.checkpoints = checkpoints if checkpoints is not None else MemoryCheckpointStore()
+        self.batch_size = batch_size
+        self.iterator_type = iterator_type
+        self.discovery_interval = discovery_interval
+
+        # Seconds between the newest record delivered for a shard and the time it was delivered
+        self.lag: Dict[str, float] = {}
+
+        self._shards: Dict[str, Dict] = {}
+        self._iterators: Dict[str, str] = {}
+        self._finished = set()
+        self._discovered_at: Optional[float] = None
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='botoful-stream')
+
+    def __enter__(self) -> StreamConsumer:
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+
+    def discover(self) -> List[str]:
+        kwargs = {'StreamArn': self.stream_arn}
+
+        while True:
+            description = self.client.describe_stream(**kwargs)['StreamDescription']
+
+            for shard in description['Shards']:
+                self._shards.setdefault(shard['ShardId'], shard)
+
+            last_shard_id = description.get('LastEvaluatedShardId')
+            if last_shard_id is None:
+                break
+
+            kwargs['ExclusiveStartShardId'] = last_shard_id
+
+        self._discovered_at = time.monotonic()
+
+        return list(self._shards)
+
+    def _is_finished(self, shard_id: str) -> bool:
+        if shard_id in self._finished:
+            return True
+
+        # A shard with a live iterator is being read, so its checkpoint need not be consulted again
+        if shard_id in self._iterators:
+            return False
+
+        if self.checkpoints.get(shard_id) == SHARD_END:
+            self._finished.add(shard_id)
+            return True
+
+        return False
+
+    def ready_shards(self) -> List[str]:
+        # Shards that still have records to read and whose parent (if still in the stream) has been consumed
+        ready = []
+
+        for shard_id, shard in self._shards.items():
+            if self._is_finished(shard_id):
+                continue
+
+            parent = shard.get('ParentShardId')
+            if parent in self._shards and not self._is_finished(parent):
+                continue
+
+            ready.append(shard_id)
+
+        return ready
+
+    def _shard_iterator(self, shard_id: str) -> str:
+        if shard_id in self._iterators:
+            return self._iterators[shard_id]
+
+        kwargs = dict(StreamArn=self.stream_arn, ShardId=shard_id)
+        sequence_number = self.checkpoints.get(shard_id)
+
+        if sequence_number is not None:
+            kwargs.update(ShardIteratorType='AFTER_SEQUENCE_NUMBER', SequenceNumber=sequence_number)
+        else:
+            kwargs.update(ShardIteratorType=self.iterator_type)
+
+        return self.client.get_shard_iterator(**kwargs)['ShardIterator']
+
+    def _poll_shard(self, shard_id: str) -> int:
+        try:
+            response = self.client.get_records(ShardIterator=self._shard_iterator(shard_id), Limit=self.batch_size)
+        except ClientError as e:
+            code = e.response['Error']['Code']
+
+            if code == 'ExpiredIteratorException':
+                # Resume from the last checkpoint on the next poll
+                self._iterators.pop(shard_id, None)
+                return 0
+
+            if code == 'TrimmedDataAccessException':
+                # The checkpoint is older than the stream's retention, continue from the oldest available record
+                self._iterators[shard_id] = self.client.get_shard_iterator(
+                    StreamArn=self.stream_arn, ShardId=shard_id, ShardIteratorType='TRIM_HORIZON'
+                )['ShardIterator']
+                return 0
+
+            raise
+
+        records = [_to_record(shard_id, record) for record in response['Records']]
+
+        if records:
+            self.handler(records)
+            self.checkpoints.put(shard_id, records[-1].sequence_number)
+
+            created = records[-1].approximate_creation_time
+            if isinstance(created, datetime):
+                now = datetime.now(created.tzinfo) if created.tzinfo else datetime.now()
+                self.lag[shard_id] = max((now - created).total_seconds(), 0.0)
+        else:
+            self.lag[shard_id] = 0.0
+
+        next_iterator = response.get('NextShardIterator')
+
+        if next_iterator is None:
+            # The shard has been closed and fully read, its children can now be consumed
+            self.checkpoints.put(shard_id, SHARD_END)
+            self._finished.add(shard_id)
+            self._iterators.pop(shard_id, None)
+            self.lag.pop(shard_id, None)
+
+            # Its children may not have been discovered yet
+            self._discovered_at = None
+        else:
+            self._iterators[shard_id] = next_iterator
+
+        return len(records)
+
+    def poll(self) -> int:
+        # Reads one batch from every ready shard, returns the number of records delivered.
+        # Shards are rediscovered every discovery_interval seconds and after a shard has been closed
+        if self._discovered_at is None or time.monotonic() - self._discovered_at >= self.discovery_interval:
+            self.discover()
+
+        futures = [self._executor.submit(self._poll_shard, shard_id) for shard_id in self.ready_shards()]
+
+        return sum(future.result() for future in futures)
+
+    def run(self, stop: Optional[threading.Event] = None, idle_interval: float = 1.0) -> None:
+        stop = stop if stop is not None else threading.Event()
+
+        while not stop.is_set():
+            if self.poll() == 0:
+                stop.wait(idle_interval)
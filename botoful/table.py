@@ -1,13 +1,24 @@
 from __future__ import annotations
 
 import copy
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
 from functools import wraps
 from typing import List, Set, Tuple, Optional, Dict
 
+from botoful.codecs import (
+    CHUNKS_ATTRIBUTE, CHUNKS_PLACEHOLDER, Codec, MissingChunkError, chunk_keys, delete_chunks, encode_item,
+    projects_chunks, resolve_chunks, write_chunks
+)
+from botoful.counter import Counter
 from botoful.reserved import RESERVED_KEYWORDS
 from botoful.serializers import serialize, deserialize
 from botoful.query import Query
 
+# Maximum number of Get entries in a single TransactGetItems request
+TRANSACT_GET_LIMIT = 100
+
 def fluent(func):
     # Decorator that assists in a fluent api.
     # It clones the current 'self', calls the wrapped method on the clone and returns the clone
@@ -21,24 +32,79 @@ def fluent(func):
 
 class Table:
 
-    def __init__(self, name, client=None):
+    def __init__(self, name, client=None, codecs: Optional[Dict[str, Codec]] = None):
         self.name = name
         self.client = client
+        self.codecs: Dict[str, Codec] = dict(codecs) if codecs else {}
 
     def __copy__(self):
-        return type(self)(name=self.name, client=self.client)
+        return type(self)(name=self.name, client=self.client, codecs=self.codecs)
 
     def __deepcopy__(self, memo):
         # A boto3 client should not be deepcopied (the instance should be maintained across copies)
-        copy = type(self)(name=self.name, client=self.client)
+        copy = type(self)(name=self.name, client=self.client, codecs=self.codecs)
         memo[id(copy)] = copy
         return copy
 
+    def codec(self, attribute: str, codec: Codec) -> Table:
+        self.codecs[attribute] = codec
+        return self
+
     def item(self, **kwargs) -> Item:
         return Item(table=self).key(**kwargs)
 
+    def counter(self, flush_interval: float = 1.0, max_pending: int = 1000, client=None) -> Counter:
+        return Counter(table=self, flush_interval=flush_interval, max_pending=max_pending, client=client)
+
     def query(self) -> Query:
-        return Query(table=self.name)
+        return Query(table=self.name, codecs=self.codecs)
+
+    def transact_get(self, items: List[Item], client=None, group_size: int = TRANSACT_GET_LIMIT, max_workers: int = 4,
+                     max_attempts: int = 5, backoff: float = 0.05) -> List[Optional[Dict]]:
+        # Reads items with TransactGetItems, returning results in the same order as the given builders.
+        # Builders for the same item are read once, since a transaction may only touch each item once.
+        # Requests larger than group_size are split into groups that are read concurrently;
+        # each group is an atomic snapshot, but separate groups are not isolated from one another.
+        # Chunks of chunked attributes are fetched after the transaction and are not part of its snapshot
+        client = client if client is not None else self.client
+
+        if client is None:
+            raise RuntimeError("You need to provide a boto3 dynamodb client")
+
+        if max_attempts < 1:
+            raise ValueError("max_attempts must be at least 1")
+
+        entries: List[Tuple[Item, Dict]] = []
+        positions: List[int] = []
+        seen: Dict[Tuple, int] = {}
+
+        for item in items:
+            # ConsistentRead is implied by a transaction and is not accepted in a Get entry
+            get = {k: v for k, v in item.build().items() if k != 'ConsistentRead'}
+            identity = (get['TableName'], *sorted((name, *value.items()) for name, value in get['Key'].items()))
+
+            if identity not in seen:
+                seen[identity] = len(entries)
+                entries.append((item, get))
+            elif entries[seen[identity]][1] != get:
+                raise ValueError(f"The same item is requested with different attributes: {get['Key']}")
+
+            positions.append(seen[identity])
+
+        groups = [entries[offset:offset + group_size] for offset in range(0, len(entries), group_size)]
+
+        def read(group):
+            return _transact_get_group(client, group, max_attempts=max_attempts, backoff=backoff)
+
+        if len(groups) <= 1:
+            results = [read(group) for group in groups]
+        else:
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(groups))) as executor:
+                results = list(executor.map(read, groups))
+
+        results = [item for group in results for item in group]
+
+        return [results[position] for position in positions]
 
 class Item:
 
@@ -85,7 +151,50 @@ class Item:
         if 'Item' not in response:
             return None
 
-        return deserialize(response['Item'])
+        if not self.table.codecs:
+            return deserialize(response['Item'])
+
+        def resolve(raw):
+            return resolve_chunks(
+                client, self.table.name, [raw], consistent=self._consistent_read, attributes=self._attributes_to_fetch
+            )
+
+        try:
+            item, = resolve(response['Item'])
+        except MissingChunkError:
+            # The item was replaced between reading it and its chunks, the new item's chunks are already written
+            response = client.get_item(**self.build())
+
+            if 'Item' not in response:
+                return None
+
+            item, = resolve(response['Item'])
+
+        return deserialize(item, codecs=self.table.codecs)
+
+    def put(self, data: Dict, client=None) -> None:
+        client = client if client is not None else self.table.client
+
+        if client is None:
+            raise RuntimeError("You need to provide a boto3 dynamodb client")
+
+        item, chunk_items = encode_item(key=self.build()['Key'], data=data, codecs=self.table.codecs)
+
+        # Chunks are written under keys unique to this put before the item itself, so the new item never refers to
+        # a chunk that has not been written and the chunks of the item being replaced are left untouched
+        if chunk_items:
+            write_chunks(client, self.table.name, chunk_items)
+
+        if not any(codec.chunked for codec in self.table.codecs.values()):
+            client.put_item(TableName=self.table.name, Item=item)
+            return
+
+        response = client.put_item(TableName=self.table.name, Item=item, ReturnValues='ALL_OLD')
+
+        # Readers still holding the replaced item will fail to find these chunks and re-read the item
+        stale_chunks = chunk_keys(response.get('Attributes', {}))
+        if stale_chunks:
+            delete_chunks(client, self.table.name, stale_chunks)
 
     def build(self):
 
@@ -115,6 +224,11 @@ class Item:
             if reserved_keywords_attributes:
                 expression_attribute_names.update({f"#{attr}": attr for attr in reserved_keywords_attributes})
 
+            # Chunked attributes are only stored as references to their chunks
+            if self.table and projects_chunks(self._attributes_to_fetch, self.table.codecs):
+                result['ProjectionExpression'] += f", {CHUNKS_PLACEHOLDER}"
+                expression_attribute_names[CHUNKS_PLACEHOLDER] = CHUNKS_ATTRIBUTE
+
         if self._consistent_read:
             result['ConsistentRead'] = self._consistent_read
 
@@ -130,3 +244,43 @@ class Item:
         self._named_variables.add(variable)
 
         return f"#{variable}"
+
+
+def _transact_get_group(client, entries: List[Tuple[Item, Dict]], max_attempts: int,
+                        backoff: float) -> List[Optional[Dict]]:
+    for attempt in range(1, max_attempts + 1):
+        try:
+            response = client.transact_get_items(TransactItems=[{'Get': get} for _, get in entries])
+            break
+        except client.exceptions.TransactionCanceledException as e:
+            reasons = e.response.get('CancellationReasons', [])
+            conflict = any(reason.get('Code') == 'TransactionConflict' for reason in reasons)
+
+            if not conflict or attempt == max_attempts:
+                raise
+
+            time.sleep(backoff * 2 ** (attempt - 1) * random.uniform(0.5, 1.5))
+
+    raw_items = [result.get('Item') for result in response['Responses']]
+
+    # Chunks for the whole group are fetched with one batched read per table
+    chunked: Dict[str, List[int]] = {}
+    for index, ((item, _), raw) in enumerate(zip(entries, raw_items)):
+        if raw is not None and item.table.codecs and chunk_keys(raw):
+            chunked.setdefault(item.table.name, []).append(index)
+
+    for table_name, indexes in chunked.items():
+        resolved = resolve_chunks(client, table_name, [raw_items[index] for index in indexes], consistent=True)
+        for index, raw in zip(indexes, resolved):
+            projection = entries[index][0]._attributes_to_fetch
+
+            # Every chunked attribute of a group is joined at once, drop those outside the item's projection
+            if projection:
+                raw = {name: value for name, value in raw.items() if name in projection}
+
+            raw_items[index] = raw
+
+    return [
+        deserialize(raw, codecs=item.table.codecs) if raw is not None else None
+        for (item, _), raw in zip(entries, raw_items)
+    ]
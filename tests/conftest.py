@@ -1,2 +1,2 @@
-from fixtures.db import client # noqa
+from fixtures.db import client, streams_client # noqa
 TABLE_NAME = 'TestTable'
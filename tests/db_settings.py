@@ -47,5 +47,6 @@ def create_table(client, settings):
                 Projection=dict(ProjectionType=gsi.projection_type)
             )
             for gsi in settings.GSIs
-        ]
+        ],
+        **({'StreamSpecification': dict(StreamEnabled=True, StreamViewType=settings.stream)} if settings.stream else {})
     )
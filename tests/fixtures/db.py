@@ -1,13 +1,13 @@
 import boto3
 import pytest
-from moto import mock_dynamodb
+from moto import mock_dynamodb, mock_dynamodbstreams
 
 from tests.db_settings import GSI, DBSettings, create_table
 
 
 @pytest.fixture(scope='session')
 def client():
-    with mock_dynamodb():
+    with mock_dynamodb(), mock_dynamodbstreams():
         client = boto3.client('dynamodb', region_name='us-west-2')
 
         clinical_table_settings = DBSettings(
@@ -25,3 +25,8 @@ def client():
         assert set(response['TableNames']) == {'TestTable'}
 
         yield client
+
+
+@pytest.fixture(scope='session')
+def streams_client(client):
+    yield boto3.client('dynamodbstreams', region_name='us-west-2')
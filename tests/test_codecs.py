@@ -0,0 +1,181 @@
+import os
+from decimal import Decimal
+
+import pytest
+
+import botoful
+from botoful import ZlibCodec
+from conftest import TABLE_NAME
+
+DOCUMENT = {
+    'title': 'A large document',
+    'tags': ['a', 'b', 'c'],
+    'sections': [{'index': i, 'text': 'lorem ipsum ' * 20} for i in range(50)]
+}
+
+
+def test_compressed_attribute_round_trip(client):
+    table = botoful.Table(name=TABLE_NAME, client=client).codec('document', ZlibCodec(level=9))
+
+    table.item(PK='CodecTest', SK='Zlib').put({'document': DOCUMENT, 'string': 'hello'})
+
+    raw = client.get_item(TableName=TABLE_NAME, Key={'PK': {'S': 'CodecTest'}, 'SK': {'S': 'Zlib'}})['Item']
+    assert 'B' in raw['document']
+    assert raw['string'] == {'S': 'hello'}
+
+    item = table.item(PK='CodecTest', SK='Zlib').get()
+    assert item == {'PK': 'CodecTest', 'SK': 'Zlib', 'document': DOCUMENT, 'string': 'hello'}
+
+    uncompressed = botoful.Table(name=TABLE_NAME, client=client).item(PK='CodecTest', SK='Zlib').get()
+    assert isinstance(uncompressed['document'].value, bytes)
+
+
+def test_chunked_attribute_round_trip(client):
+    # Random hex only compresses to about half its size, so the encoded value is larger than an item can hold
+    blob = os.urandom(400 * 1024).hex()
+    table = botoful.Table(name=TABLE_NAME, client=client).codec(
+        'blob', ZlibCodec(level=1, chunked=True, chunk_size=128 * 1024)
+    )
+
+    table.item(PK='ChunkTest', SK='Item').put({'blob': blob})
+
+    raw = client.get_item(TableName=TABLE_NAME, Key={'PK': {'S': 'ChunkTest'}, 'SK': {'S': 'Item'}})['Item']
+    assert 'blob' not in raw
+    assert len(raw['__chunks__']['M']['blob']['L']) > 1
+
+    item = table.item(PK='ChunkTest', SK='Item').consistent().get()
+    assert item == {'PK': 'ChunkTest', 'SK': 'Item', 'blob': blob}
+
+    result = table.query().key(PK='ChunkTest').execute(client)
+    assert result.items == [item]
+
+    # Chunk items live outside the parent's partition, even for a table that knows nothing about codecs
+    plain = botoful.Table(name=TABLE_NAME, client=client).query().key(PK='ChunkTest').execute(client)
+    assert [i['SK'] for i in plain.items] == ['Item']
+
+
+def test_chunk_items_do_not_count_towards_limit(client):
+    table = botoful.Table(name=TABLE_NAME, client=client).codec(
+        'blob', ZlibCodec(level=1, chunked=True, chunk_size=128 * 1024)
+    )
+
+    for i in range(3):
+        table.item(PK='ChunkLimitTest', SK=f"{i}").put({'blob': os.urandom(400 * 1024).hex()})
+
+    result = table.query().key(PK='ChunkLimitTest').limit(2).execute(client)
+
+    assert result.count == 2
+    assert [item['SK'] for item in result] == ['0', '1']
+    assert result.next_token is not None
+
+
+def test_replacing_a_chunked_item_deletes_its_old_chunks(client):
+    table = botoful.Table(name=TABLE_NAME, client=client).codec(
+        'blob', ZlibCodec(level=1, chunked=True, chunk_size=128 * 1024)
+    )
+    item = table.item(PK='ChunkReplaceTest', SK='Item')
+    key = {'PK': {'S': 'ChunkReplaceTest'}, 'SK': {'S': 'Item'}}
+
+    def chunks():
+        raw = client.get_item(TableName=TABLE_NAME, Key=key)['Item']
+        return [ref['M'] for ref in raw['__chunks__']['M']['blob']['L']] if '__chunks__' in raw else []
+
+    item.put({'blob': os.urandom(400 * 1024).hex()})
+    first = chunks()
+
+    item.put({'blob': os.urandom(400 * 1024).hex()})
+    second = chunks()
+
+    item.put({'blob': 'small'})
+
+    assert first and second
+    assert not {ref['PK']['S'] for ref in first} & {ref['PK']['S'] for ref in second}
+    assert all('Item' not in client.get_item(TableName=TABLE_NAME, Key=ref) for ref in first + second)
+    assert chunks() == []
+    assert item.get()['blob'] == 'small'
+
+
+def test_chunking_is_decided_on_item_size(client):
+    # Each attribute fits in an item on its own, but together they do not
+    first, second = os.urandom(230 * 1024).hex(), os.urandom(200 * 1024).hex()
+    table = (
+        botoful.Table(name=TABLE_NAME, client=client)
+        .codec('first', ZlibCodec(level=1, chunked=True))
+        .codec('second', ZlibCodec(level=1, chunked=True))
+    )
+
+    table.item(PK='ChunkSizeTest', SK='Item').put({'first': first, 'second': second})
+
+    raw = client.get_item(TableName=TABLE_NAME, Key={'PK': {'S': 'ChunkSizeTest'}, 'SK': {'S': 'Item'}})['Item']
+    assert list(raw['__chunks__']['M']) == ['first']
+    assert 'second' in raw
+
+    assert table.item(PK='ChunkSizeTest', SK='Item').get() == {
+        'PK': 'ChunkSizeTest', 'SK': 'Item', 'first': first, 'second': second
+    }
+
+
+def test_codec_values_round_trip_exactly():
+    codec = ZlibCodec()
+    value = {'price': Decimal('19.99'), 'tags': {'a', 'b'}, 'count': 3, 'nested': [{'ok': True, 'none': None}]}
+
+    assert codec.decode(codec.encode(value)) == value
+
+    with pytest.raises(TypeError):
+        codec.encode({'ratio': 0.5})
+
+
+def test_small_values_are_not_chunked(client):
+    table = botoful.Table(name=TABLE_NAME, client=client).codec('blob', ZlibCodec(chunked=True))
+
+    table.item(PK='ChunkTest', SK='Small').put({'blob': 'small'})
+
+    raw = client.get_item(TableName=TABLE_NAME, Key={'PK': {'S': 'ChunkTest'}, 'SK': {'S': 'Small'}})['Item']
+    assert '__chunks__' not in raw
+    assert table.item(PK='ChunkTest', SK='Small').get()['blob'] == 'small'
+
+
+def test_projection_of_a_chunked_attribute(client):
+    blob = os.urandom(400 * 1024).hex()
+    table = botoful.Table(name=TABLE_NAME, client=client).codec(
+        'blob', ZlibCodec(level=1, chunked=True, chunk_size=128 * 1024)
+    )
+
+    table.item(PK='ChunkProjectionTest', SK='Item').put({'blob': blob, 'string': 'hello'})
+
+    assert table.item(PK='ChunkProjectionTest', SK='Item').attributes(['blob']).get() == {'blob': blob}
+    assert table.item(PK='ChunkProjectionTest', SK='Item').attributes(['string']).get() == {'string': 'hello'}
+
+    result = table.query().key(PK='ChunkProjectionTest').attributes(['blob']).execute(client)
+    assert result.items == [{'blob': blob}]
+
+    assert table.transact_get([table.item(PK='ChunkProjectionTest', SK='Item').attributes(['blob'])]) == [
+        {'blob': blob}
+    ]
+
+
+def test_query_retries_when_chunks_are_replaced(client):
+    blob = os.urandom(400 * 1024).hex()
+    table = botoful.Table(name=TABLE_NAME, client=client).codec(
+        'blob', ZlibCodec(level=1, chunked=True, chunk_size=128 * 1024)
+    )
+    table.item(PK='ChunkRaceTest', SK='Item').put({'blob': blob})
+
+    class RacingClient:
+        # The first chunk read comes back empty, as if a concurrent put had deleted the chunks
+        batch_reads = 0
+
+        def get_paginator(self, name):
+            return client.get_paginator(name)
+
+        def batch_get_item(self, **kwargs):
+            self.batch_reads += 1
+            if self.batch_reads == 1:
+                return {'Responses': {}}
+            return client.batch_get_item(**kwargs)
+
+    racing = RacingClient()
+    result = table.query().key(PK='ChunkRaceTest').execute(racing)
+
+    assert racing.batch_reads == 2
+    assert result.items == [{'PK': 'ChunkRaceTest', 'SK': 'Item', 'blob': blob}]
@@ -0,0 +1,141 @@
+import time
+
+import pytest
+from botocore.exceptions import ClientError
+
+import botoful
+import botoful.counter as counter_module
+from conftest import TABLE_NAME
+
+
+def test_increments_are_coalesced(client):
+    table = botoful.Table(name=TABLE_NAME, client=client)
+    views = table.item(PK='CounterTest', SK='Views')
+    other = table.item(PK='CounterTest', SK='Other')
+
+    with table.counter(flush_interval=60) as counter:
+        for _ in range(10):
+            counter.increment(views, 'views')
+            counter.increment(views, 'clicks', amount=2)
+        counter.increment(other, 'views')
+
+        assert counter.pending == 2
+        assert counter.writes == 0
+
+    assert counter.increments == 21
+    assert counter.writes == 2
+    assert counter.coalescing_ratio == 10.5
+    assert counter.last_flush_latency is not None
+
+    assert views.get() == {'PK': 'CounterTest', 'SK': 'Views', 'views': 10, 'clicks': 20}
+    assert other.get() == {'PK': 'CounterTest', 'SK': 'Other', 'views': 1}
+
+    with pytest.raises(RuntimeError):
+        counter.increment(views, 'views')
+
+
+def test_flush_on_size_threshold(client):
+    table = botoful.Table(name=TABLE_NAME, client=client)
+    counter = table.counter(flush_interval=60, max_pending=2)
+
+    counter.increment(table.item(PK='CounterTest', SK='Size1'), 'count')
+    counter.increment(table.item(PK='CounterTest', SK='Size2'), 'count')
+
+    deadline = time.monotonic() + 5
+    while counter.writes < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert counter.writes == 2
+    counter.close()
+
+    assert table.item(PK='CounterTest', SK='Size2').get()['count'] == 1
+
+
+def test_invalid_amounts_are_rejected(client):
+    table = botoful.Table(name=TABLE_NAME, client=client)
+
+    with table.counter(flush_interval=60, client=client) as counter:
+        for amount in (1.5, '1', True):
+            with pytest.raises(TypeError):
+                counter.increment(table.item(PK='CounterTest', SK='Invalid'), 'count', amount=amount)
+
+        assert counter.pending == 0
+
+
+def test_rejected_increments_do_not_block_other_keys(client):
+    table = botoful.Table(name=TABLE_NAME, client=client)
+    table.item(PK='CounterTest', SK='NotANumber').put({'count': 'text'})
+
+    with table.counter(flush_interval=60) as counter:
+        counter.increment(table.item(PK='CounterTest', SK='NotANumber'), 'count')
+        counter.increment(table.item(PK='CounterTest', SK='Valid'), 'count')
+
+    assert counter.pending == 0
+    assert [key for key, _, _ in counter.dropped] == [{'PK': {'S': 'CounterTest'}, 'SK': {'S': 'NotANumber'}}]
+    assert table.item(PK='CounterTest', SK='Valid').get()['count'] == 1
+
+
+class ThrottledClient:
+    # Raises ProvisionedThroughputExceededException for the first `throttled` update_item calls
+
+    def __init__(self, client, throttled):
+        self.client = client
+        self.throttled = throttled
+        self.updates = []
+
+    def update_item(self, **kwargs):
+        self.updates.append(kwargs)
+
+        if len(self.updates) <= self.throttled:
+            raise ClientError({'Error': {'Code': 'ProvisionedThroughputExceededException'}}, 'UpdateItem')
+
+        return self.client.update_item(**kwargs)
+
+
+def test_close_retries_throttled_flush(client, monkeypatch):
+    monkeypatch.setattr(counter_module, 'CLOSE_FLUSH_BACKOFF', 0)
+    table = botoful.Table(name=TABLE_NAME, client=client)
+    throttled = ThrottledClient(client, throttled=2)
+
+    with table.counter(flush_interval=60, client=throttled) as counter:
+        counter.increment(table.item(PK='CounterTest', SK='Throttled'), 'count')
+
+    assert counter.pending == 0
+    assert counter.dropped == []
+    assert len(throttled.updates) == 3
+    assert table.item(PK='CounterTest', SK='Throttled').get()['count'] == 1
+
+
+def test_close_reports_increments_it_could_not_write(client, monkeypatch):
+    monkeypatch.setattr(counter_module, 'CLOSE_FLUSH_BACKOFF', 0)
+    table = botoful.Table(name=TABLE_NAME, client=client)
+    counter = table.counter(flush_interval=60, client=ThrottledClient(client, throttled=100))
+
+    counter.increment(table.item(PK='CounterTest', SK='AlwaysThrottled'), 'count', amount=3)
+
+    with pytest.raises(ClientError):
+        counter.close()
+
+    assert counter.pending == 0
+    assert [(key['SK'], attributes) for key, attributes, _ in counter.dropped] == [
+        ({'S': 'AlwaysThrottled'}, {'count': 3})
+    ]
+    assert isinstance(counter.last_error, ClientError)
+
+
+def test_increments_are_written_to_the_item_table(client):
+    table = botoful.Table(name=TABLE_NAME, client=client)
+    other = botoful.Table(name='OtherTable', client=client)
+    updates = []
+
+    class RecordingClient:
+        def update_item(self, **kwargs):
+            updates.append(kwargs)
+
+    with table.counter(flush_interval=60, client=RecordingClient()) as counter:
+        counter.increment(table.item(PK='CounterTest', SK='SameKey'), 'count')
+        counter.increment(other.item(PK='CounterTest', SK='SameKey'), 'count')
+
+        assert counter.pending == 2
+
+    assert sorted(update['TableName'] for update in updates) == ['OtherTable', TABLE_NAME]
@@ -5,6 +5,7 @@ import pytest
 import botoful
 import botoful.serializers as serializers
 from botoful import ValueOf
+from botoful.query import _merge_capacity
 from conftest import TABLE_NAME
 
 TEST_ITEM_1 = {
@@ -157,3 +158,69 @@ def test_comparision_queries(client):
 def test_invalid_number_of_keys():
     with pytest.raises(ValueError):
         botoful.Query(table=TABLE_NAME).key(PK=1, SK=1, GSI1PK=1)
+
+
+def test_query_result_is_a_lazy_sequence(client):
+    built = []
+
+    class Model:
+        def __init__(self, **kwargs):
+            built.append(kwargs)
+            self.__dict__.update(kwargs)
+
+    results = base_query.return_consumed_capacity().execute(client, model=Model, cache_models=True)
+
+    assert built == []
+    assert len(results) == 20
+    assert results.scanned_count == 20
+    assert results.consumed_capacity is not None
+    assert results.last_evaluated_key is None
+    assert results[0] is results[0]
+    assert results[-1].string == '19'
+    assert [item.number for item in results[5:7]] == [5, 6]
+    assert len(built) == 4
+
+    with pytest.raises(IndexError):
+        results[20]
+
+    with pytest.raises(AttributeError):
+        results.extra = True
+
+    uncached = base_query.execute(client, model=Model)
+    assert uncached[0] is not uncached[0]
+
+
+def test_consumed_capacity_is_summed_across_pages():
+    def capacity(units):
+        return {
+            'TableName': TABLE_NAME,
+            'CapacityUnits': units,
+            'GlobalSecondaryIndexes': {'GSI1': {'CapacityUnits': units}}
+        }
+
+    assert _merge_capacity(_merge_capacity(None, capacity(0.5)), capacity(1.0)) == capacity(1.5)
+
+
+def test_query_result_last_evaluated_key(client):
+    results = base_query.page_size(5).execute(client)
+
+    assert results.last_evaluated_key == {'PK': 'FluentAPITest', 'SK': 'FluentAPITest04SK'}
+
+
+def test_last_evaluated_key_with_truncated_page(client):
+    # The filter discards items, so botocore truncates a page to return exactly page_size items
+    results = base_query.page_size(5).filter(ValueOf('number').gt(2)).execute(client)
+
+    assert [item['string'] for item in results] == ['03', '04', '05', '06', '07']
+    assert results.last_evaluated_key == {'PK': 'FluentAPITest', 'SK': 'FluentAPITest07SK'}
+
+
+def test_items_list_is_built_once(client):
+    class Model:
+        def __init__(self, **kwargs):
+            self.__dict__.update(kwargs)
+
+    results = base_query.execute(client, model=Model)
+
+    assert results.items is results.items
+    assert results.items[0].string == '00'
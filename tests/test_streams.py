@@ -0,0 +1,128 @@
+from botocore.exceptions import ClientError
+
+import botoful
+from botoful.streams import StreamConsumer, MemoryCheckpointStore, TableCheckpointStore, SHARD_END
+from conftest import TABLE_NAME
+
+
+def _record(sequence_number, pk, value):
+    return {
+        'eventName': 'MODIFY',
+        'dynamodb': {
+            'SequenceNumber': sequence_number,
+            'Keys': {'PK': {'S': pk}},
+            'NewImage': {'PK': {'S': pk}, 'value': {'N': str(value)}},
+        }
+    }
+
+
+class FakeStreamsClient:
+    # A local stand-in for the dynamodbstreams client with a closed parent shard and an open child shard
+
+    def __init__(self, shards, records):
+        self.shards = shards
+        self.records = records
+        self.calls = []
+        self.describe_calls = 0
+
+    def describe_stream(self, StreamArn, ExclusiveStartShardId=None):
+        self.describe_calls += 1
+        return {'StreamDescription': {'Shards': self.shards}}
+
+    def get_shard_iterator(self, StreamArn, ShardId, ShardIteratorType, SequenceNumber=None):
+        position = 0
+        if ShardIteratorType == 'AFTER_SEQUENCE_NUMBER':
+            sequence_numbers = [r['dynamodb']['SequenceNumber'] for r in self.records[ShardId]]
+
+            if SequenceNumber not in sequence_numbers:
+                raise ClientError({'Error': {'Code': 'TrimmedDataAccessException'}}, 'GetShardIterator')
+
+            position = sequence_numbers.index(SequenceNumber) + 1
+
+        return {'ShardIterator': f"{ShardId}|{position}"}
+
+    def get_records(self, ShardIterator, Limit):
+        shard_id, position = ShardIterator.split('|')
+        position = int(position)
+        self.calls.append(shard_id)
+
+        records = self.records[shard_id][position:position + Limit]
+        position += len(records)
+
+        closed = shard_id == 'parent' and position == len(self.records[shard_id])
+        return {'Records': records, 'NextShardIterator': None if closed else f"{shard_id}|{position}"}
+
+
+def test_child_shards_are_consumed_after_parent():
+    client = FakeStreamsClient(
+        shards=[{'ShardId': 'child', 'ParentShardId': 'parent'}, {'ShardId': 'parent'}],
+        records={
+            'parent': [_record('1', 'a', 1), _record('2', 'b', 1), _record('3', 'a', 2)],
+            'child': [_record('4', 'a', 3), _record('5', 'b', 2)],
+        }
+    )
+    delivered = []
+    checkpoints = MemoryCheckpointStore()
+
+    with StreamConsumer(client, 'arn', handler=delivered.extend, checkpoints=checkpoints, batch_size=2) as consumer:
+        assert consumer.poll() == 2
+        assert consumer.ready_shards() == ['parent']
+        assert consumer.poll() == 1
+        assert consumer.poll() == 2
+        assert consumer.poll() == 0
+
+    # Shards are discovered on the first poll and again once the parent has been closed
+    assert client.describe_calls == 2
+
+    assert [r.new_image['value'] for r in delivered if r.keys == {'PK': 'a'}] == [1, 2, 3]
+    assert [r.new_image['value'] for r in delivered if r.keys == {'PK': 'b'}] == [1, 2]
+    assert checkpoints.checkpoints == {'parent': SHARD_END, 'child': '5'}
+
+    # A new consumer resumes from the checkpoints
+    resumed = []
+    client.records['child'].append(_record('6', 'b', 3))
+
+    with StreamConsumer(client, 'arn', handler=resumed.extend, checkpoints=checkpoints) as consumer:
+        assert consumer.poll() == 1
+
+    assert [r.sequence_number for r in resumed] == ['6']
+
+
+def test_trimmed_checkpoint_resumes_from_trim_horizon():
+    client = FakeStreamsClient(
+        shards=[{'ShardId': 'child'}],
+        records={'child': [_record('10', 'a', 1), _record('11', 'a', 2)]}
+    )
+    checkpoints = MemoryCheckpointStore()
+    checkpoints.put('child', '5')
+    delivered = []
+
+    with StreamConsumer(client, 'arn', handler=delivered.extend, checkpoints=checkpoints) as consumer:
+        assert consumer.poll() == 0
+        assert consumer.poll() == 2
+
+    assert [r.sequence_number for r in delivered] == ['10', '11']
+    assert checkpoints.get('child') == '11'
+
+
+def test_consume_table_stream(client, streams_client):
+    table = botoful.Table(name=TABLE_NAME, client=client)
+    stream_arn = client.describe_table(TableName=TABLE_NAME)['Table']['LatestStreamArn']
+
+    for i in range(3):
+        table.item(PK='StreamTest', SK='Item').put({'value': i})
+
+    delivered = []
+    checkpoints = TableCheckpointStore(table, consumer='StreamTestConsumer')
+
+    with StreamConsumer(streams_client, stream_arn, handler=delivered.extend, checkpoints=checkpoints) as consumer:
+        consumer.poll()
+
+    records = [r for r in delivered if r.keys == {'PK': 'StreamTest', 'SK': 'Item'}]
+
+    assert [r.event_name for r in records] == ['INSERT', 'MODIFY', 'MODIFY']
+    assert [r.new_image['value'] for r in records] == [0, 1, 2]
+    assert records[1].old_image['value'] == 0
+
+    shard_id = records[-1].shard_id
+    assert checkpoints.get(shard_id) == delivered[-1].sequence_number
@@ -1,5 +1,10 @@
+import os
+
+import pytest
+
 import botoful
 import botoful.serializers as serializers
+from botoful import ZlibCodec
 from conftest import TABLE_NAME
 
 TEST_ITEM_1 = {
@@ -30,10 +35,107 @@ def test_fetch_item(client):
     item = table.item(PK='TableTestItem1', SK='TestItem1SK').attributes(['boolean', 'string']).get()
     assert item == {'boolean': True, 'string': 'hello'}
 
+
 def test_query_using_table_api(client):
     table = botoful.Table(name=TABLE_NAME, client=client)
 
     result = table.query().key(PK='TableTestItem1').execute(client=client)
 
     assert result.count == 1
-    assert result.items == [TEST_ITEM_1]
\ No newline at end of file
+    assert result.items == [TEST_ITEM_1]
+
+
+def test_transact_get(client):
+    table = botoful.Table(name=TABLE_NAME, client=client)
+
+    for i in range(150):
+        table.item(PK='TransactTest', SK=f"{i:03}").put({'number': i})
+
+    builders = [table.item(PK='TransactTest', SK=f"{i:03}") for i in reversed(range(150))]
+    builders.append(table.item(PK='TransactTest', SK='does-not-exist'))
+
+    # moto still enforces the original limit of 25 items per transaction
+    items = table.transact_get(builders, group_size=25)
+
+    assert len(items) == 151
+    assert [item['number'] for item in items[:-1]] == list(reversed(range(150)))
+    assert items[-1] is None
+
+
+def test_transact_get_reads_duplicate_items_once(client):
+    table = botoful.Table(name=TABLE_NAME, client=client)
+    requests = []
+
+    class RecordingClient:
+        exceptions = client.exceptions
+
+        def transact_get_items(self, **kwargs):
+            requests.append(kwargs)
+            return client.transact_get_items(**kwargs)
+
+    item = table.item(PK='TableTestItem1', SK='TestItem1SK')
+    missing = table.item(PK='does-not-exist', SK='does-not-exist')
+
+    assert table.transact_get([item, missing, item], client=RecordingClient()) == [TEST_ITEM_1, None, TEST_ITEM_1]
+    assert len(requests[0]['TransactItems']) == 2
+
+    with pytest.raises(ValueError):
+        table.transact_get([item, item.attributes(['number'])])
+
+    with pytest.raises(ValueError):
+        table.transact_get([item], max_attempts=0)
+
+
+def test_transact_get_resolves_chunks(client):
+    table = botoful.Table(name=TABLE_NAME, client=client).codec(
+        'blob', ZlibCodec(level=1, chunked=True, chunk_size=128 * 1024)
+    )
+    blobs = [os.urandom(400 * 1024).hex() for _ in range(2)]
+
+    for i, blob in enumerate(blobs):
+        table.item(PK='TransactChunkTest', SK=f"{i}").put({'blob': blob})
+
+    batch_reads = []
+
+    class RecordingClient:
+        exceptions = client.exceptions
+
+        def transact_get_items(self, **kwargs):
+            return client.transact_get_items(**kwargs)
+
+        def batch_get_item(self, **kwargs):
+            batch_reads.append(kwargs)
+            return client.batch_get_item(**kwargs)
+
+    items = table.transact_get([table.item(PK='TransactChunkTest', SK=f"{i}") for i in range(2)],
+                               client=RecordingClient())
+
+    assert [item['blob'] for item in items] == blobs
+    assert len(batch_reads) == 1
+
+
+def test_transact_get_retries_conflicts(client):
+    table = botoful.Table(name=TABLE_NAME, client=client)
+    attempts = []
+
+    class ConflictingClient:
+        exceptions = client.exceptions
+
+        def transact_get_items(self, **kwargs):
+            attempts.append(kwargs)
+            if len(attempts) < 3:
+                raise client.exceptions.TransactionCanceledException(
+                    {'Error': {'Code': 'TransactionCanceledException'},
+                     'CancellationReasons': [{'Code': 'TransactionConflict'}]},
+                    'TransactGetItems'
+                )
+            return client.transact_get_items(**kwargs)
+
+    items = table.transact_get([table.item(PK='TableTestItem1', SK='TestItem1SK').consistent()],
+                               client=ConflictingClient(), backoff=0)
+
+    assert len(attempts) == 3
+    assert attempts[0]['TransactItems'] == [
+        {'Get': {'TableName': TABLE_NAME, 'Key': {'PK': {'S': 'TableTestItem1'}, 'SK': {'S': 'TestItem1SK'}}}}
+    ]
+    assert items == [TEST_ITEM_1]